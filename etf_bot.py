@@ -1,9 +1,11 @@
 # etf_bot.py — Alerts-only (Render-ready)
-import os, json, asyncio, datetime as dt
+import os, math, time, bisect, asyncio, datetime as dt
+from urllib.parse import quote
+import orjson
+import numpy as np
 import discord
 from discord.ext import commands
-import yfinance as yf
-import pandas as pd
+import aiohttp
 from aiohttp import web
 
 # ====== Config from environment ======
@@ -14,26 +16,178 @@ ALERT_INTERVAL_SEC = int(os.getenv("ALERT_INTERVAL_SEC", "300"))  # default 5 mi
 # Behavior
 SKIP_IF_NO_SHARES = True
 PIP50, PIP75, PIP100 = 0.50, 0.75, 1.00
+LVL50, LVL75, LVL100 = 1, 2, 4  # trigger level bits, see _fired_mask
 
+MSG_LIMIT = 1990  # Discord caps messages at 2000 chars
 DATA_FILE = "positions.json"
+LOG_FILE = "positions.log"   # append-only deltas on top of DATA_FILE
+LOG_COMPACT_LINES = 200      # fold the log into DATA_FILE after this many deltas
+SAVE_DELAY_SEC = 0.5  # coalesce bursts of edits into one write
+QUOTE_URL = "https://query1.finance.yahoo.com/v7/finance/quote"  # needs cookie + crumb
+COOKIE_URL = "https://fc.yahoo.com"  # sets the session cookie the crumb is tied to
+CRUMB_URL = "https://query1.finance.yahoo.com/v1/test/getcrumb"
+CHART_URL = "https://query1.finance.yahoo.com/v8/finance/chart/{}"  # per-ticker fallback
+HTTP_HEADERS = {"User-Agent": "Mozilla/5.0"}  # Yahoo rejects the default aiohttp UA
+PRICE_TTL_SEC = 30  # /status and the alerts loop share prices fetched within this window
 
 # ====== Persistence ======
 def load_positions():
     try:
         if not os.path.exists(DATA_FILE):
             return {}
-        txt = open(DATA_FILE, "r", encoding="utf-8").read().strip()
-        return json.loads(txt) if txt else {}
+        with open(DATA_FILE, "rb") as f:
+            raw = f.read().strip()
+        return orjson.loads(raw) if raw else {}
     except Exception as e:
         print(f"[WARN] positions.json parse failed: {e}")
         return {}
 
+def _dump_positions(data):
+    # serialize to memory first so the file gets one buffered write
+    return orjson.dumps(data)
+
+def _write_positions_atomic(buf):
+    tmp = DATA_FILE + ".tmp"
+    with open(tmp, "wb", buffering=1024 * 1024) as f:
+        f.write(buf)
+    os.replace(tmp, DATA_FILE)  # readers never see a half-written file
+
 def save_positions(data):
-    with open(DATA_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
+    _write_positions_atomic(_dump_positions(data))
+
+# Change log: one JSON delta per line, replayed over DATA_FILE on startup.
+# Every op carries absolute values, so replaying an entry twice is harmless.
+def apply_change(data, rec):
+    op, t = rec["op"], rec["t"]
+    if op == "set":
+        if t in data: data[t][rec["k"]] = rec["v"]
+    elif op == "add":
+        data.setdefault(t, rec["v"])
+    elif op == "del":
+        data.pop(t, None)
+
+def replay_log(data):
+    n = 0
+    for path in (LOG_FILE + ".1", LOG_FILE):  # .1 = log rotated by an unfinished compaction
+        try:
+            with open(path, "rb") as f:
+                for ln in f:
+                    try:
+                        apply_change(data, orjson.loads(ln)); n += 1
+                    except (ValueError, KeyError):
+                        print(f"[WARN] skipping bad {path} line: {ln.strip()[:80]!r}")
+        except FileNotFoundError:
+            pass
+    return n
+
+_log_fp = None
+_log_lines = 0
+
+def log_change(op, t, k=None, v=None):
+    global _log_fp, _log_lines
+    rec = {"op": op, "t": t}
+    if k is not None: rec["k"] = k
+    if op != "del": rec["v"] = v
+    line = orjson.dumps(rec) + b"\n"  # serialize first: a bad value never reaches the file
+    if _log_fp is None:
+        _log_fp = open(LOG_FILE, "ab")
+    _log_fp.write(line); _log_fp.flush()
+    _log_lines += 1
+    if _log_lines >= LOG_COMPACT_LINES:
+        schedule_save()
+    return rec
+
+def _rotate_log():
+    # Called in the same step as the snapshot copy, so LOG_FILE.1 holds exactly
+    # the deltas that snapshot covers and LOG_FILE starts fresh for later edits.
+    global _log_fp, _log_lines
+    if _log_fp is not None:
+        _log_fp.close(); _log_fp = None
+    _log_lines = 0
+    if not os.path.exists(LOG_FILE):
+        return
+    if os.path.exists(LOG_FILE + ".1"):  # previous compaction never finished
+        with open(LOG_FILE, "rb") as src, open(LOG_FILE + ".1", "ab") as dst:
+            dst.write(src.read())
+        os.remove(LOG_FILE)
+    else:
+        os.replace(LOG_FILE, LOG_FILE + ".1")
+
+def _compact(data):
+    save_positions(data)
+    try:
+        os.remove(LOG_FILE + ".1")
+    except FileNotFoundError:
+        pass
+
+_save_task: asyncio.Task | None = None
+_save_dirty = False
+
+async def _delayed_save():
+    global _save_dirty
+    while _save_dirty:  # edits made during a write trigger one more pass
+        await asyncio.sleep(SAVE_DELAY_SEC)
+        _save_dirty = False
+        # Snapshot on the loop (commands edit the per-ticker dicts in place, so
+        # copy those too); serializing and writing happen in a worker thread.
+        snap = {t: dict(i) for t, i in positions.items()}
+        _rotate_log()
+        try:
+            await asyncio.to_thread(_compact, snap)
+        except Exception as e:
+            print(f"[WARN] positions.json compaction failed: {e}")
+
+def schedule_save():
+    """Snapshot positions into DATA_FILE (debounced) and retire the change log."""
+    global _save_task, _save_dirty
+    _save_dirty = True
+    if _save_task is None or _save_task.done():
+        _save_task = asyncio.create_task(_delayed_save())
 
 positions = load_positions()
-alert_fired = set()   # (YYYY-MM-DD, TICKER, "50"|"75"|"100")
+_log_lines = replay_log(positions)
+
+# Derived views of `positions`, rebuilt by reindex() after every mutating command
+active_tickers: list[str] = []   # active tickers, in positions order
+sorted_tickers: list[str] = sorted(positions)  # kept sorted by /add and /remove
+adj_cache: dict[str, float] = {} # alert-eligible ticker -> avg_cost - cum_div
+_tickers_summary: str | None = None  # /tickers reply, built on demand
+# (ticker, LVL*) -> alert text from the last tick the ticker sat at that level.
+# Refreshed every tick and dropped as soon as the ticker leaves the level, so it
+# only mutes a quote that hasn't moved at all, even across the daily _fired_mask
+# reset. Pruned by reindex() once a ticker stops being alert-eligible.
+_last_alert_text: dict[tuple[str, int], str] = {}
+
+def reindex():
+    global _tickers_summary
+    _tickers_summary = None
+    active_tickers.clear(); adj_cache.clear()
+    for t, i in positions.items():
+        if not i.get("active", True): continue
+        active_tickers.append(t)
+        shares = int(i.get("shares", 0) or 0)
+        if SKIP_IF_NO_SHARES and shares == 0: continue
+        avg = i.get("avg_cost")
+        if avg is None: continue
+        adj_cache[t] = avg - float(i.get("cum_div", 0.0) or 0.0)
+    for key in [k for k in _last_alert_text if k[0] not in adj_cache]:
+        del _last_alert_text[key]
+
+reindex()
+
+def commit_change(op, t, k=None, v=None):
+    """Log an edit, then apply it to positions and the derived views.
+
+    The log write comes first, so if it raises nothing in memory has changed.
+    """
+    rec = log_change(op, t, k, v)
+    apply_change(positions, rec)
+    if op == "add": bisect.insort(sorted_tickers, t)
+    elif op == "del": sorted_tickers.remove(t); _price_cache.pop(t, None)
+    reindex()
+
+_fired_date = ""                 # YYYY-MM-DD the masks below belong to
+_fired_mask: dict[str, int] = {} # ticker -> OR of LVL* bits already alerted today
 
 # ====== Discord bot ======
 intents = discord.Intents.default()
@@ -41,63 +195,139 @@ intents.message_content = True  # enable in Dev Portal
 bot = commands.Bot(command_prefix="/", intents=intents, help_command=None)
 
 # ====== Prices ======
+SESSION: aiohttp.ClientSession | None = None  # one pooled session for the app's lifetime
+
+_crumb: str | None = None  # Yahoo crumb for SESSION's cookie, fetched on first use
+
+def get_session():
+    global SESSION, _crumb
+    if SESSION is None or SESSION.closed:
+        SESSION = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=20, keepalive_timeout=75),
+            headers=HTTP_HEADERS,
+            timeout=aiohttp.ClientTimeout(total=15),
+        )
+        _crumb = None  # new cookie jar, old crumb is useless
+    return SESSION
+
+async def get_crumb():
+    global _crumb
+    if _crumb is None:
+        s = get_session()
+        async with s.get(COOKIE_URL) as r:  # usually a 404, but it sets the cookie
+            await r.read()
+        async with s.get(CRUMB_URL) as r:
+            r.raise_for_status()
+            crumb = (await r.text()).strip()
+        if not crumb or "<" in crumb:
+            raise ValueError(f"bad crumb response: {crumb[:80]!r}")
+        _crumb = crumb
+    return _crumb
+
+_last_warning: dict[str, str] = {}  # source -> last warning printed
+
+def warn_once(source, msg):
+    """Print a warning, but only when it differs from the last one for source."""
+    if _last_warning.get(source) != msg:
+        _last_warning[source] = msg
+        print(f"[WARN] {source}: {msg}")
+
+def clear_warning(source):
+    if _last_warning.pop(source, None) is not None:
+        print(f"[INFO] {source}: recovered")
+
+_price_cache: dict[str, tuple[float, float]] = {}  # sym -> (monotonic ts, price)
+_fetch_lock = asyncio.Lock()  # one Yahoo fetch at a time; waiters reuse its results
+
+def _split_cached(tickers):
+    now = time.monotonic()
+    cached, stale = {}, []
+    for t in tickers:
+        hit = _price_cache.get(t)
+        if hit and now - hit[0] < PRICE_TTL_SEC:
+            cached[t] = hit[1]
+        else:
+            stale.append(t)
+    return cached, stale
+
 async def fetch_prices_batch(tickers):
+    cached, stale = _split_cached(tickers)
+    if stale:
+        async with _fetch_lock:
+            # a fetch that was in flight while we waited may have filled these
+            more, stale = _split_cached(stale)
+            cached.update(more)
+            out = await _fetch_prices_uncached(stale)
+            fetched_at = time.monotonic()
+            for t, p in out.items():
+                if p is not None:
+                    _price_cache[t] = (fetched_at, p)
+    else:
+        out = {}
+    out.update(cached)
+    return out
+
+async def _fetch_prices_uncached(tickers):
     out = {t: None for t in tickers}
     if not tickers:
         return out
+    global _crumb
     try:
-        data = yf.download(
-            tickers=" ".join(tickers),
-            period="1d",
-            interval="1m",
-            progress=False,
-            threads=True,
-            group_by="ticker",
-        )
-        if isinstance(data.columns, pd.MultiIndex):
-            for t in tickers:
-                try:
-                    s = data[(t, "Close")].dropna()
-                    if not s.empty:
-                        out[t] = float(s.iloc[-1])
-                except Exception:
-                    pass
+        params = {"symbols": ",".join(tickers), "crumb": await get_crumb()}
+        async with get_session().get(QUOTE_URL, params=params) as r:
+            if r.status in (401, 403): _crumb = None  # expired: redo the handshake next tick
+            r.raise_for_status()
+            j = orjson.loads(await r.read())
+        for q in j["quoteResponse"]["result"]:
+            sym, price = q.get("symbol"), q.get("regularMarketPrice")
+            if sym in out and price is not None:
+                out[sym] = float(price)
+        clear_warning("quote batch")
+    except Exception as e:
+        warn_once("quote batch", f"{type(e).__name__}: {e}; falling back to per-ticker chart")
+        # Fallback per-ticker, all tickers concurrently
+        results = await asyncio.gather(*[_fetch_one(t) for t in tickers], return_exceptions=True)
+        failed = {}  # exception type -> tickers
+        for t, price in zip(tickers, results):
+            if isinstance(price, BaseException):
+                failed.setdefault(type(price).__name__, []).append(t); price = None
+            out[t] = price
+        if failed:
+            warn_once("chart fallback", "; ".join(f"{name} for {', '.join(ts)}" for name, ts in sorted(failed.items())))
         else:
-            try:
-                s = data["Close"].dropna()
-                if not s.empty:
-                    out[tickers[0]] = float(s.iloc[-1])
-            except Exception:
-                pass
-    except Exception:
-        # Fallback per-ticker
-        for t in tickers:
-            try:
-                s = yf.Ticker(t).history(period="1d", interval="1m")["Close"].dropna()
-                if not s.empty:
-                    out[t] = float(s.iloc[-1])
-            except Exception:
-                out[t] = None
+            clear_warning("chart fallback")
     return out
 
+async def _fetch_one(t):
+    async with get_session().get(CHART_URL.format(quote(t, safe=""))) as r:
+        r.raise_for_status()
+        j = orjson.loads(await r.read())
+    price = j["chart"]["result"][0]["meta"].get("regularMarketPrice")
+    return float(price) if price is not None else None
+
+# Income floor bands: price <= _FLOOR_EDGES[i] -> _FLOORS[i]; nothing below $5
+_FLOOR_EDGES = (11, 17, 22, 27, 32, 36)
+_FLOORS = (0.50, 0.75, 1.00, 1.50, 2.50, 3.00, "No-buys > $36")
+
 def income_floor_for_price(price):
-    if price is None: return None
-    if price < 5:   return None
-    if price <= 11: return 0.50
-    if price <= 17: return 0.75
-    if price <= 22: return 1.00
-    if price <= 27: return 1.50
-    if price <= 32: return 2.50
-    if price <= 36: return 3.00
-    return "No-buys > $36"
+    if price is None or price < 5: return None
+    return _FLOORS[bisect.bisect_left(_FLOOR_EDGES, price)]
 
 def calc_triggers(adj, price):
     pip50 = adj - PIP50; pip75 = adj - PIP75; pip100 = adj - PIP100
-    if price is None: return None, "No price"
-    if price <= pip100: return "100", f"Buy trigger hit at 100 pip (${pip100:.2f})"
-    if price <= pip75:  return "75",  f"Buy trigger hit at 75 pip (${pip75:.2f})"
-    if price <= pip50:  return "50",  f"Buy trigger hit at 50 pip (${pip50:.2f})"
-    return None, "No buy levels triggered."
+    if price is None: return 0, "No price"
+    if price <= pip100: return LVL100, f"Buy trigger hit at 100 pip (${pip100:.2f})"
+    if price <= pip75:  return LVL75,  f"Buy trigger hit at 75 pip (${pip75:.2f})"
+    if price <= pip50:  return LVL50,  f"Buy trigger hit at 50 pip (${pip50:.2f})"
+    return 0, "No buy levels triggered."
+
+def calc_levels(adj_arr, price_arr):
+    """Vectorized calc_triggers: LVL* bit per row, 0 where nothing triggers."""
+    return np.select(
+        [price_arr <= adj_arr - PIP100, price_arr <= adj_arr - PIP75, price_arr <= adj_arr - PIP50],
+        [LVL100, LVL75, LVL50],
+        default=0,
+    )
 
 def line_for_report(t, info, price):
     if not info.get("active", True): return None
@@ -112,55 +342,92 @@ def line_for_report(t, info, price):
     return f"{t} — Adjusted ${adj:.2f}, current ${price:.2f}. {trig_text} {floor_txt} Shares: {shares}"
 
 async def build_status():
-    actives = [t for t,i in positions.items() if i.get("active", True)]
-    prices = await fetch_prices_batch(actives)
+    prices = await fetch_prices_batch(active_tickers)
     lines = []
-    for t in sorted(positions.keys()):
+    for t in sorted_tickers:
         ln = line_for_report(t, positions[t], prices.get(t))
         if ln: lines.append(ln)
     return "📊 ETF Status\n" + "\n".join(lines) if lines else "No active tickers (skipped or missing data)."
 
-async def send_alert(ch, t, price, adj, trig_text):
-    await ch.send(
+def alert_text(t, price, adj, trig_text):
+    return (
         f"📉 **BUY ALERT** {t}: current ${price:.2f}, adjusted ${adj:.2f}. "
         f"{trig_text} → Consider GTC limit buy."
     )
 
+def chunk_lines(lines, limit=MSG_LIMIT):
+    """Join lines into as few messages as fit Discord's length limit."""
+    chunks, cur = [], ""
+    for ln in lines:
+        ln = ln[:limit]
+        if cur and len(cur) + 1 + len(ln) > limit:
+            chunks.append(cur); cur = ln
+        else:
+            cur = f"{cur}\n{ln}" if cur else ln
+    if cur: chunks.append(cur)
+    return chunks
+
+_today_cached = ""   # local YYYY-MM-DD
+_today_until = 0.0   # epoch seconds of the next local midnight
+
+def today_key():
+    """Local date string, reformatted only when the day rolls over."""
+    global _today_cached, _today_until
+    if time.time() >= _today_until:
+        now = dt.datetime.now()
+        _today_cached = now.strftime("%Y-%m-%d")
+        _today_until = dt.datetime.combine(now.date() + dt.timedelta(days=1), dt.time()).timestamp()
+    return _today_cached
+
 # ====== Alerts loop only ======
 async def alerts_loop():
     await bot.wait_until_ready()
     ch = bot.get_channel(CHANNEL_ID)
     if ch:
         await ch.send("🚀 ETF Anchor Bot online! Alerts enabled. Use `/help` or `/status` anytime.")
+    global _fired_date
+    loop = asyncio.get_running_loop()
+    deadline = loop.time()
     while not bot.is_closed():
         try:
-            actives = [t for t,i in positions.items() if i.get("active", True)]
-            prices = await fetch_prices_batch(actives)
-            today = dt.datetime.now().strftime("%Y-%m-%d")
-            for t in actives:
-                info = positions.get(t, {})
-                shares = int(info.get("shares", 0) or 0)
-                if SKIP_IF_NO_SHARES and shares == 0:
-                    continue
-                avg = info.get("avg_cost"); cum = float(info.get("cum_div", 0.0) or 0.0)
-                price = prices.get(t)
-                if avg is None or price is None: continue
-                adj = avg - cum
-                level, trig_text = calc_triggers(adj, price)
-                if level:
-                    key = (today, t, level)
-                    if key not in alert_fired:
-                        alert_fired.add(key)
-                        if ch:
-                            await send_alert(ch, t, price, adj, trig_text)
+            prices = await fetch_prices_batch(list(adj_cache))
+            today = today_key()
+            if today != _fired_date:
+                _fired_date = today; _fired_mask.clear()
+            pending_lines = []
+            priced = [(t, adj, prices[t]) for t, adj in adj_cache.items() if prices.get(t) is not None]
+            if priced:
+                tks, adjs, pxs = zip(*priced)
+                levels = calc_levels(np.array(adjs, dtype=np.float64), np.array(pxs, dtype=np.float64))
+                level_of = dict(zip(tks, levels.tolist()))
+                # forget texts for levels a priced ticker has left this tick
+                for key in [k for k in _last_alert_text if level_of.get(k[0], k[1]) != k[1]]:
+                    del _last_alert_text[key]
+                for i in np.flatnonzero(levels):
+                    t, adj, price, level = tks[i], adjs[i], pxs[i], int(levels[i])
+                    _, trig_text = calc_triggers(adj, price)
+                    txt = alert_text(t, price, adj, trig_text)
+                    prev = _last_alert_text.get((t, level)); _last_alert_text[(t, level)] = txt
+                    m = _fired_mask.get(t, 0)
+                    if not (m & level) and prev != txt:  # unchanged since last tick: nothing new
+                        _fired_mask[t] = m | level
+                        pending_lines.append(txt)
+            if ch:
+                for msg in chunk_lines(pending_lines):
+                    await ch.send(msg)
         except Exception as e:
             if ch: await ch.send(f"Alert loop error: {e}")
-        await asyncio.sleep(ALERT_INTERVAL_SEC)
+        # sleep to a fixed cadence so slow fetches don't push every later tick back
+        deadline += ALERT_INTERVAL_SEC
+        now = loop.time()
+        if deadline < now: deadline = now  # fell a whole interval behind: don't burst
+        await asyncio.sleep(deadline - now)
 
 # ====== Commands ======
 @bot.event
 async def on_ready():
     print(f"✅ Logged in as {bot.user}")
+    get_session()
     bot.loop.create_task(alerts_loop())
 
 @bot.command()
@@ -187,24 +454,39 @@ async def status(ctx):
 
 @bot.command(name="tickers")
 async def tickers_cmd(ctx):
+    global _tickers_summary
     if not positions: return await ctx.send("No tickers tracked yet.")
-    rows = []
-    for t,i in positions.items():
-        rows.append(f"{t}: shares={i.get('shares',0)}, avg={i.get('avg_cost')}, cumDiv={i.get('cum_div',0)}, active={i.get('active',True)}")
-    await ctx.send("Tracked:\n" + "\n".join(rows))
+    if _tickers_summary is None:
+        rows = []
+        for t,i in positions.items():
+            rows.append(f"{t}: shares={i.get('shares',0)}, avg={i.get('avg_cost')}, cumDiv={i.get('cum_div',0)}, active={i.get('active',True)}")
+        _tickers_summary = "Tracked:\n" + "\n".join(rows)
+    await ctx.send(_tickers_summary)
+
+# orjson can't store NaN/inf (written as null) or ints beyond 64 bits, so
+# reject those up front; the commands below report ValueError as "Invalid number."
+def finite_float(value):
+    x = float(value)
+    if not math.isfinite(x): raise ValueError(f"not a finite number: {value}")
+    return x
+
+def int64(value):
+    n = int(finite_float(value))
+    if not -2**63 <= n < 2**63: raise ValueError(f"out of range: {value}")
+    return n
 
 @bot.command()
 async def add(ctx, ticker: str):
     t = ticker.upper()
-    positions.setdefault(t, {"avg_cost": None, "cum_div": 0.0, "shares": 0, "active": True})
-    save_positions(positions)
+    if t not in positions:
+        commit_change("add", t, v={"avg_cost": None, "cum_div": 0.0, "shares": 0, "active": True})
     await ctx.send(f"Added {t}. Use `/setavg {t} 12.34`, `/setshares {t} 10`, `/setdiv {t} 0.25`.")
 
 @bot.command()
 async def remove(ctx, ticker: str):
     t = ticker.upper()
     if t in positions:
-        del positions[t]; save_positions(positions); await ctx.send(f"Removed {t}.")
+        commit_change("del", t); await ctx.send(f"Removed {t}.")
     else:
         await ctx.send(f"{t} not found.")
 
@@ -213,8 +495,9 @@ async def setavg(ctx, ticker: str, value: str):
     t = ticker.upper()
     if t not in positions: return await ctx.send(f"{t} not tracked. `/add {t}` first.")
     try:
-        positions[t]["avg_cost"] = float(value); save_positions(positions)
-        await ctx.send(f"{t} avg cost = {float(value):.4f}.")
+        avg = finite_float(value)
+        commit_change("set", t, "avg_cost", avg)
+        await ctx.send(f"{t} avg cost = {avg:.4f}.")
     except ValueError:
         await ctx.send("Invalid number.")
 
@@ -223,8 +506,9 @@ async def setdiv(ctx, ticker: str, value: str):
     t = ticker.upper()
     if t not in positions: return await ctx.send(f"{t} not tracked. `/add {t}` first.")
     try:
-        positions[t]["cum_div"] = float(value); save_positions(positions)
-        await ctx.send(f"{t} cumulative div = {float(value):.4f}.")
+        cum = finite_float(value)
+        commit_change("set", t, "cum_div", cum)
+        await ctx.send(f"{t} cumulative div = {cum:.4f}.")
     except ValueError:
         await ctx.send("Invalid number.")
 
@@ -233,9 +517,8 @@ async def adddiv(ctx, ticker: str, value: str):
     t = ticker.upper()
     if t not in positions: return await ctx.send(f"{t} not tracked. `/add {t}` first.")
     try:
-        inc = float(value)
-        positions[t]["cum_div"] = float(positions[t].get("cum_div", 0.0) or 0.0) + inc
-        save_positions(positions)
+        inc = finite_float(value)
+        commit_change("set", t, "cum_div", finite_float(float(positions[t].get("cum_div", 0.0) or 0.0) + inc))
         await ctx.send(f"{t} cum_div increased by {inc:.4f}. New cum_div = {positions[t]['cum_div']:.4f}.")
     except ValueError:
         await ctx.send("Invalid number. Usage: `/adddiv TICKER 0.25`")
@@ -244,7 +527,7 @@ async def adddiv(ctx, ticker: str, value: str):
 async def resetdiv(ctx, ticker: str):
     t = ticker.upper()
     if t not in positions: return await ctx.send(f"{t} not tracked. `/add {t}` first.")
-    positions[t]["cum_div"] = 0.0; save_positions(positions)
+    commit_change("set", t, "cum_div", 0.0)
     await ctx.send(f"{t} cum_div reset to 0.0000.")
 
 @bot.command()
@@ -252,8 +535,9 @@ async def setshares(ctx, ticker: str, value: str):
     t = ticker.upper()
     if t not in positions: return await ctx.send(f"{t} not tracked. `/add {t}` first.")
     try:
-        positions[t]["shares"] = int(float(value)); save_positions(positions)
-        await ctx.send(f"{t} shares = {int(float(value))}.")
+        shares = int64(value)
+        commit_change("set", t, "shares", shares)
+        await ctx.send(f"{t} shares = {shares}.")
     except ValueError:
         await ctx.send("Invalid number.")
 
@@ -262,10 +546,10 @@ async def active(ctx, ticker: str, flag: str):
     t = ticker.upper()
     if t not in positions: return await ctx.send(f"{t} not tracked. `/add {t}` first.")
     fl = flag.lower()
-    if fl in ("on","true","yes","1"): positions[t]["active"] = True
-    elif fl in ("off","false","no","0"): positions[t]["active"] = False
+    if fl in ("on","true","yes","1"): commit_change("set", t, "active", True)
+    elif fl in ("off","false","no","0"): commit_change("set", t, "active", False)
     else: return await ctx.send("Use `/active TICKER on|off`")
-    save_positions(positions); await ctx.send(f"{t} active = {positions[t]['active']}.")
+    await ctx.send(f"{t} active = {positions[t]['active']}.")
 
 @bot.command()
 async def setpips(ctx, p50: str, p75: str, p100: str):
@@ -292,14 +576,21 @@ async def handle_root(request): return web.Response(text="OK")
 async def start_web():
     app = web.Application()
     app.router.add_get("/", handle_root)
-    runner = web.AppRunner(app); await runner.setup()
+    # pinger hits us every ~30s: hold connections open, skip per-request access logs
+    runner = web.AppRunner(app, access_log=None, keepalive_timeout=120); await runner.setup()
     site = web.TCPSite(runner, "0.0.0.0", int(os.getenv("PORT", "10000")))
     await site.start()
 
 # ====== Entry ======
 async def main():
     await start_web()          # start tiny web server
-    await bot.start(TOKEN)     # start Discord bot
+    try:
+        await bot.start(TOKEN) # start Discord bot
+    finally:
+        if _save_task is not None and not _save_task.done():
+            await _save_task   # flush pending edits before exit
+        if SESSION is not None and not SESSION.closed:
+            await SESSION.close()
 
 if __name__ == "__main__":
     if not TOKEN or not CHANNEL_ID: